@@ -1,10 +1,14 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
 import plotly.graph_objects as go
+from plotly.colors import qualitative
 import numpy as np
-from datetime import datetime
+import pyarrow as pa
+import pyarrow.compute as pa_compute
+import pyarrow.csv as pa_csv
+from datetime import datetime, timedelta
 import io
+import xxhash
 
 # Configuração da página
 st.set_page_config(
@@ -29,50 +33,126 @@ COLUNAS_DESEJADAS = [
     'Entregue'
 ]
 
+# Colunas usadas apenas em filtros e gráficos, mantidas junto das colunas de exportação
+COLUNAS_FILTRO_EXTRAS = [
+    'EstadoEntrega',
+    'Uf'
+]
+
+# Filtros categóricos da sidebar: (coluna, rótulo, aviso quando não há opções válidas)
+FILTROS_CATEGORICOS = [
+    ('EstadoEntrega', 'Estado:', None),
+    ('StatusAtual', 'Status:', None),
+    ('TipoProduto', 'Tipo de Produto:', 'Nenhum tipo de produto válido encontrado')
+]
+
+# Colunas convertidas para o tipo categórico ao carregar os dados
+COLUNAS_CATEGORICAS = [
+    'EstadoEntrega',
+    'StatusAtual',
+    'TipoProduto',
+    'ModeloProduto',
+    'Uf',
+    'ApelidoDoEquipamento'
+]
+
+# Colunas contadas para os gráficos de barras, pizza e mapa, com o limite de categorias
+# exibidas (top 10 nos gráficos de barras; None mantém todas)
+COLUNAS_CONTAGEM = {
+    'EstadoEntrega': 10,
+    'StatusAtual': None,
+    'TipoProduto': 10,
+    'ModeloProduto': 10,
+    'Uf': None,
+    'TemData': None
+}
+
 # Função para carregar dados com tratamento de erros e upload
-@st.cache_data
-def load_data(uploaded_file):
-    if uploaded_file is None:
+# (o cache é indexado por file_hash; parâmetros iniciados com "_" não são hasheados pelo Streamlit).
+# cache_resource devolve o mesmo DataFrame sem copiá-lo: o restante do script não deve alterá-lo
+@st.cache_resource
+def load_data(file_hash, _uploaded_file):
+    if _uploaded_file is None:
         return pd.DataFrame()
 
     try:
-        file_extension = uploaded_file.name.split(".")[-1].lower()
+        file_extension = _uploaded_file.name.split(".")[-1].lower()
         if file_extension == "csv":
-            # Tentativa de carregar com diferentes encodings
+            # Lê o conteúdo uma única vez e identifica o encoding decodificando
+            # em memória, em vez de repetir o parse completo a cada tentativa
+            conteudo = _uploaded_file.getvalue()
             encodings = ["utf-8", "latin-1", "iso-8859-1", "cp1252"]
-            df = None
+            encoding_detectado = None
             for encoding in encodings:
                 try:
-                    df = pd.read_csv(uploaded_file, encoding=encoding, sep=";")
+                    conteudo.decode(encoding)
+                    encoding_detectado = encoding
                     break
-                except:
-                    uploaded_file.seek(0) # Reset file pointer for next attempt
+                except UnicodeDecodeError:
                     continue
-            if df is None:
+            if encoding_detectado is None:
                 raise Exception("Não foi possível decodificar o arquivo CSV com os encodings tentados.")
+            # Parser multi-thread do pyarrow (bem mais rápido que o parser padrão)
+            try:
+                df = pd.read_csv(io.BytesIO(conteudo), encoding=encoding_detectado, sep=";", engine="pyarrow")
+            except pd.errors.ParserError:
+                # O pyarrow recusa linhas com menos colunas; o parser padrão as completa com NaN
+                df = pd.read_csv(io.BytesIO(conteudo), encoding=encoding_detectado, sep=";")
         elif file_extension in ["xls", "xlsx"]:
-            df = pd.read_excel(uploaded_file)
+            # Leitor calamine (Rust), bem mais rápido que o openpyxl
+            df = pd.read_excel(_uploaded_file, engine="calamine")
         else:
             st.error("Formato de arquivo não suportado. Por favor, faça upload de um arquivo CSV ou Excel.")
             return pd.DataFrame()
 
+        # Manter apenas as colunas usadas pelo dashboard, reduzindo o volume de dados processado
+        # (a lista original fica em attrs para a seção de informações sobre o arquivo)
+        colunas_arquivo = df.columns.tolist()
+        colunas_usadas = COLUNAS_DESEJADAS + COLUNAS_FILTRO_EXTRAS
+        df = df.drop(columns=[col for col in df.columns if col not in colunas_usadas])
+
         # Tratamento de dados
         if "DataPedido" in df.columns:
             df["DataPedido"] = pd.to_datetime(df["DataPedido"], errors="coerce", dayfirst=True)
         if "PrevisaoEntrega" in df.columns:
             df["PrevisaoEntrega"] = pd.to_datetime(df["PrevisaoEntrega"], errors="coerce", dayfirst=True)
+        if "Entregue" in df.columns:
+            df["Entregue"] = pd.to_datetime(df["Entregue"], errors="coerce", dayfirst=True)
+            # Indicador de entrega calculado uma única vez por arquivo
+            df["TemData"] = df["Entregue"].notna().to_numpy()
+        else:
+            df["TemData"] = False
 
         # CORREÇÃO: Tratamento específico para QuantidadeProduto
         if "QuantidadeProduto" in df.columns:
             # Converter para numérico, forçando erros para NaN
             df["QuantidadeProduto"] = pd.to_numeric(df["QuantidadeProduto"], errors="coerce")
-            # Preencher NaN com 0
-            df["QuantidadeProduto"] = df["QuantidadeProduto"].fillna(0)
+            # Preencher NaN com 0 e reduzir para inteiro de 32 bits
+            df["QuantidadeProduto"] = df["QuantidadeProduto"].fillna(0).astype("int32")
         
-        # Preencher outros valores nulos com "Não informado"
-        df_text_cols = df.select_dtypes(include=['object']).columns
+        # Preencher outros valores nulos com "Não informado" (o texto vem como object no pandas 2
+        # e como "str" no pandas 3)
+        df_text_cols = df.select_dtypes(include=['object', 'string']).columns
         df[df_text_cols] = df[df_text_cols].fillna("Não informado")
 
+        # Colunas de baixa cardinalidade viram categóricas (comparações sobre códigos inteiros).
+        # Colunas object podem misturar números e texto (ex.: ModeloProduto 3200 e "M18" em
+        # planilhas), o que o Arrow não converte; seus valores viram texto antes da conversão
+        for col in COLUNAS_CATEGORICAS:
+            if col in df.columns:
+                if df[col].dtype == object:
+                    df[col] = df[col].astype("string[pyarrow]")
+                df[col] = df[col].astype("category")
+
+        # Demais colunas de texto usam strings do Arrow (comparações em C++, sem objetos Python)
+        for col in df.select_dtypes(include=['object', 'string']).columns:
+            df[col] = df[col].astype("string[pyarrow]")
+
+        # Ordenar por data do pedido (datas inválidas ao final) para filtrar o período por busca binária
+        if "DataPedido" in df.columns:
+            df = df.sort_values("DataPedido", kind="stable")
+
+        df.attrs["colunas_arquivo"] = colunas_arquivo
         return df
     except Exception as e:
         st.error(f"Erro ao carregar dados: {e}")
@@ -84,9 +164,20 @@ def safe_percentage(numerator, denominator):
         return 0
     return (numerator / denominator) * 100
 
+# Função para selecionar os filtros categóricos presentes no arquivo
+def available_filters(columns):
+    return tuple(filtro for filtro in FILTROS_CATEGORICOS if filtro[0] in columns)
+
+# Função para listar as opções de um filtro (valores únicos, sem "Não informado")
+@st.cache_data
+def unique_sorted(filter_key, col, _df, _mask):
+    valores_unicos = _df[col][_mask].dropna().unique()
+    return sorted(valor for valor in valores_unicos if valor != "Não informado")
+
 # Função para calcular métricas com tratamento de erros
-def calculate_metrics(df):
-    if df.empty:
+@st.cache_data
+def calculate_metrics(filter_key, _df):
+    if _df.empty:
         return {
             "total_pedidos": 0,
             "pedidos_entregues": 0,
@@ -95,21 +186,18 @@ def calculate_metrics(df):
             "taxa_entrega": 0
         }
 
-    total_pedidos = len(df)
+    total_pedidos = len(_df)
 
-    # Verificar se a coluna "Entregue" existe
-    if "Entregue" in df.columns:
-        # Converte para datetime e ignora erros
-        df["Entregue"] = pd.to_datetime(df["Entregue"], errors="coerce", dayfirst=True)
-        pedidos_entregues = df["Entregue"].notna().sum()
+    # Indicador de entrega pré-calculado em load_data
+    if "TemData" in _df.columns:
+        pedidos_entregues = _df["TemData"].sum()
     else:
         pedidos_entregues = 0
 
     # CORREÇÃO: Verificar se a coluna "QuantidadeProduto" existe e calcular corretamente
-    if "QuantidadeProduto" in df.columns:
-        # Garantir que os valores são numéricos
-        quantidade_numerica = pd.to_numeric(df["QuantidadeProduto"], errors="coerce").fillna(0)
-        quantidade_total = quantidade_numerica.sum()
+    if "QuantidadeProduto" in _df.columns:
+        # Já convertida para int32 (sem nulos) em load_data; a soma acumula em int64
+        quantidade_total = _df["QuantidadeProduto"].sum()
     else:
         quantidade_total = 0
 
@@ -124,9 +212,41 @@ def calculate_metrics(df):
         "taxa_entrega": taxa_entrega
     }
 
+# Função para contar os k valores mais frequentes de uma coluna, em ordem decrescente
+def top_counts(series, k=None):
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # Contagem direta sobre os códigos inteiros, descartando categorias sem ocorrência no filtro
+        codes = series.cat.codes.to_numpy()
+        code_counts = np.bincount(codes[codes >= 0], minlength=len(series.cat.categories))
+        present = np.flatnonzero(code_counts)
+        values = series.cat.categories[present]
+        counts = code_counts[present]
+    else:
+        # Sem ordenação: a seleção abaixo ordena apenas os k maiores
+        value_counts = series.value_counts(sort=False)
+        values = value_counts.index
+        counts = value_counts.to_numpy()
+
+    # Seleção linear dos k maiores; apenas eles são ordenados
+    if k is not None and len(counts) > k:
+        top = np.argpartition(-counts, k - 1)[:k]
+    else:
+        top = np.arange(len(counts))
+    top = top[np.argsort(-counts[top], kind="stable")]
+    return pd.Series(counts[top], index=values[top])
+
+# Função para contar os valores de várias colunas em uma única chamada
+@st.cache_data
+def count_values(filter_key, _df, columns):
+    counts = {}
+    for col, k in columns.items():
+        if col in _df.columns:
+            counts[col] = top_counts(_df[col], k)
+    return counts
+
 # Função para criar gráfico de barras com tratamento de dados vazios
-def create_bar_chart(df, x_col, title, color_sequence=None):
-    if df.empty or x_col not in df.columns:
+def create_bar_chart(counts, x_col, title, color_sequence=None):
+    if counts is None:
         fig = go.Figure()
         fig.add_annotation(
             text="Dados não disponíveis",
@@ -137,9 +257,6 @@ def create_bar_chart(df, x_col, title, color_sequence=None):
         fig.update_layout(title=title, height=400)
         return fig
 
-    # Contar valores e tratar dados vazios
-    counts = df[x_col].value_counts().head(10)
-
     if counts.empty:
         fig = go.Figure()
         fig.add_annotation(
@@ -151,15 +268,15 @@ def create_bar_chart(df, x_col, title, color_sequence=None):
         fig.update_layout(title=title, height=400)
         return fig
 
-    fig = px.bar(
-        x=counts.index,
-        y=counts.values,
-        title=title,
-        labels={'x': x_col, 'y': 'Quantidade'},
-        color_discrete_sequence=color_sequence or px.colors.qualitative.Set3
-    )
+    fig = go.Figure(go.Bar(
+        x=counts.index.tolist(),
+        y=counts.values.tolist(),
+        marker_color=(color_sequence or qualitative.Set3)[0],
+        hovertemplate=f"{x_col}=%{{x}}<br>Quantidade=%{{y}}<extra></extra>"
+    ))
 
     fig.update_layout(
+        title=title,
         xaxis_title=x_col,
         yaxis_title="Quantidade",
         height=400,
@@ -169,8 +286,8 @@ def create_bar_chart(df, x_col, title, color_sequence=None):
     return fig
 
 # Função para criar gráfico de pizza com tratamento de dados vazios
-def create_pie_chart(df, col, title):
-    if df.empty or col not in df.columns:
+def create_pie_chart(counts, title):
+    if counts is None:
         fig = go.Figure()
         fig.add_annotation(
             text="Dados não disponíveis",
@@ -181,9 +298,6 @@ def create_pie_chart(df, col, title):
         fig.update_layout(title=title, height=400)
         return fig
 
-    # Contar valores e tratar dados vazios
-    counts = df[col].value_counts()
-
     if counts.empty:
         fig = go.Figure()
         fig.add_annotation(
@@ -195,14 +309,14 @@ def create_pie_chart(df, col, title):
         fig.update_layout(title=title, height=400)
         return fig
 
-    fig = px.pie(
-        values=counts.values,
-        names=counts.index,
-        title=title,
-        color_discrete_sequence=px.colors.qualitative.Set3
-    )
+    fig = go.Figure(go.Pie(
+        values=counts.values.tolist(),
+        labels=counts.index.tolist(),
+        marker_colors=qualitative.Set3,
+        hovertemplate="label=%{label}<br>value=%{value}<extra></extra>"
+    ))
 
-    fig.update_layout(height=400)
+    fig.update_layout(title=title, height=400)
     return fig
 
 # Função para criar gráfico de linha temporal com tratamento de dados vazios
@@ -218,10 +332,11 @@ def create_timeline_chart(df, date_col, title):
         fig.update_layout(title=title, height=400)
         return fig
 
-    # Filtrar dados válidos
-    df_valid = df[df[date_col].notna()].copy()
+    # Filtrar datas válidas direto no array, sem recortar o DataFrame
+    valid_mask = df[date_col].notna().to_numpy()
+    valid_dates = df[date_col].to_numpy()[valid_mask]
 
-    if df_valid.empty:
+    if valid_dates.size == 0:
         fig = go.Figure()
         fig.add_annotation(
             text="Nenhuma data válida encontrada",
@@ -232,10 +347,18 @@ def create_timeline_chart(df, date_col, title):
         fig.update_layout(title=title, height=400)
         return fig
 
-    # Agrupar por mês
-    df_valid["Mes"] = df_valid[date_col].dt.to_period('M')
-    monthly_counts = df_valid.groupby("Mes").size().reset_index(name="Quantidade")
-    monthly_counts["Mes"] = monthly_counts["Mes"].astype(str)
+    # Agrupar por mês com aritmética inteira (meses desde 1970) em vez de objetos Period
+    months = valid_dates.astype("datetime64[M]").view("i8")
+    first_month = months.min()
+    # Subtração in-place: o array já é uma cópia local, evita um temporário antes do bincount
+    months -= first_month
+    month_counts = np.bincount(months)
+    # Manter apenas os meses com pedidos, como no agrupamento original
+    month_offsets = np.flatnonzero(month_counts)
+    monthly_counts = pd.DataFrame({
+        "Mes": (month_offsets + first_month).astype("datetime64[M]").astype(str),
+        "Quantidade": month_counts[month_offsets]
+    })
 
     if monthly_counts.empty:
         fig = go.Figure()
@@ -248,15 +371,15 @@ def create_timeline_chart(df, date_col, title):
         fig.update_layout(title=title, height=400)
         return fig
 
-    fig = px.line(
-        monthly_counts,
-        x="Mes",
-        y="Quantidade",
-        title=title,
-        markers=True
-    )
+    fig = go.Figure(go.Scattergl(
+        x=monthly_counts["Mes"],
+        y=monthly_counts["Quantidade"],
+        mode="lines+markers",
+        hovertemplate="Mes=%{x}<br>Quantidade=%{y}<extra></extra>"
+    ))
 
     fig.update_layout(
+        title=title,
         xaxis_title="Mês",
         yaxis_title="Quantidade",
         height=400
@@ -265,8 +388,8 @@ def create_timeline_chart(df, date_col, title):
     return fig
 
 # Função para criar mapa com tratamento de dados vazios
-def create_map(df, location_col, title):
-    if df.empty or location_col not in df.columns:
+def create_map(counts, location_col, title):
+    if counts is None:
         fig = go.Figure()
         fig.add_annotation(
             text="Dados geográficos não disponíveis",
@@ -277,11 +400,7 @@ def create_map(df, location_col, title):
         fig.update_layout(title=title, height=500)
         return fig
 
-    # Contar por localização
-    location_counts = df[location_col].value_counts().reset_index()
-    location_counts.columns = [location_col, "Quantidade"]
-
-    if location_counts.empty:
+    if counts.empty:
         fig = go.Figure()
         fig.add_annotation(
             text="Nenhum dado de localização encontrado",
@@ -292,16 +411,25 @@ def create_map(df, location_col, title):
         fig.update_layout(title=title, height=500)
         return fig
 
+    # Contagem por localização como tupla, chave do cache da figura
+    location_counts = tuple(zip(counts.index.tolist(), counts.tolist()))
+    return build_map(location_counts, location_col, title)
+
+# Função para montar o mapa coroplético (reaproveitada enquanto as contagens não mudam; cache_data
+# devolve uma cópia por sessão, e o limite de entradas evita acumular uma figura por combinação de filtros)
+@st.cache_data(max_entries=50)
+def build_map(location_counts, location_col, title):
+    locations, quantities = zip(*location_counts)
+
     # Criar mapa coroplético do Brasil
-    fig = px.choropleth(
-        location_counts,
-        locations=location_col,
-        color="Quantidade",
+    fig = go.Figure(go.Choropleth(
+        locations=list(locations),
+        z=list(quantities),
         locationmode="geojson-id",
-        title=title,
-        color_continuous_scale="Blues",
-        labels={'Quantidade': 'Número de Pedidos'}
-    )
+        colorscale="Blues",
+        colorbar_title="Número de Pedidos",
+        hovertemplate=f"{location_col}=%{{location}}<br>Número de Pedidos=%{{z}}<extra></extra>"
+    ))
 
     fig.update_geos(
         projection_type="natural earth",
@@ -309,9 +437,88 @@ def create_map(df, location_col, title):
         lakecolor='rgb(255, 255, 255)'
     )
 
-    fig.update_layout(height=500)
+    fig.update_layout(title=title, height=500)
     return fig
 
+# Função para gerar o CSV de exportação com o writer em C++ do pyarrow (cacheada com poucas
+# entradas e por tempo limitado, pois cada combinação de filtros guarda um arquivo inteiro)
+@st.cache_data(max_entries=10, ttl=3600)
+def build_csv(filter_key, _df):
+    table = pa.Table.from_pandas(_df, preserve_index=False)
+
+    # Verdadeiro se nenhum valor da coluna tem fração abaixo da unidade (nulos são ignorados)
+    def sem_fracao(column, unit):
+        return pa_compute.all(pa_compute.equal(pa_compute.floor_temporal(column, unit=unit), column)).as_py() is not False
+
+    # O writer não aceita colunas categóricas (dictionary). Como no to_csv do pandas, colunas de
+    # data com todos os horários à meia-noite saem só com a data; as demais, na menor precisão
+    # que preserva todos os valores (segundos, milissegundos ou microssegundos)
+    columns = []
+    for column in table.columns:
+        if pa.types.is_dictionary(column.type):
+            column = column.cast(column.type.value_type)
+        elif pa.types.is_timestamp(column.type):
+            if sem_fracao(column, "day"):
+                column = column.cast(pa.date32(), safe=False)
+            else:
+                for unit, pa_unit in (("second", "s"), ("millisecond", "ms"), ("microsecond", "us")):
+                    if sem_fracao(column, unit):
+                        column = column.cast(pa.timestamp(pa_unit))
+                        break
+        columns.append(column)
+    table = pa.Table.from_arrays(columns, names=table.column_names)
+
+    # Cabeçalho escrito à parte (nomes fixos de COLUNAS_DESEJADAS, sem aspas)
+    header = (";".join(table.column_names) + "\n").encode("utf-8")
+
+    def write_csv(quoting_style):
+        buffer = pa.BufferOutputStream()
+        buffer.write(header)
+        pa_csv.write_csv(table, buffer, pa_csv.WriteOptions(include_header=False, delimiter=";", quoting_style=quoting_style))
+        return buffer.getvalue().to_pybytes()
+
+    # Valores sem aspas, como no to_csv; se algum valor contiver ";", aspas ou quebra de linha,
+    # o pyarrow recusa esse modo e todos os textos passam a ser escritos entre aspas
+    try:
+        return write_csv("none")
+    except pa.ArrowInvalid:
+        return write_csv("needed")
+
+# Função para gerar o arquivo Excel de exportação (cacheada para não regerar a cada interação;
+# poucas entradas e por tempo limitado, pois cada combinação de filtros guarda um arquivo inteiro)
+@st.cache_data(max_entries=10, ttl=3600)
+def build_excel(filter_key, _df):
+    excel_buffer = io.BytesIO()
+    with pd.ExcelWriter(excel_buffer, engine="xlsxwriter") as writer:
+        _df.to_excel(writer, index=False)
+    return excel_buffer.getvalue()
+
+# Seção de exportação em fragmento: um clique de download reexecuta apenas este trecho,
+# sem refazer filtros, métricas e gráficos da página
+@st.fragment
+def export_section(filter_key, df):
+    st.markdown("### 📥 Exportar Dados")
+
+    # Filtrar colunas para exportação
+    cols_to_export = [col for col in COLUNAS_DESEJADAS if col in df.columns]
+    df_export = df[cols_to_export]
+
+    # Botão de download CSV
+    st.download_button(
+        label="Download CSV",
+        data=build_csv(filter_key, df_export),
+        file_name=f"acompanhamento_filtrado_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+        mime="text/csv"
+    )
+
+    # Botão de download Excel
+    st.download_button(
+        label="Download Excel",
+        data=build_excel(filter_key, df_export),
+        file_name=f"acompanhamento_filtrado_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
+        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    )
+
 # Interface principal
 st.markdown("---")
 
@@ -322,7 +529,10 @@ st.markdown("""
     <hr style='border: 1px solid #444;'>
 """, unsafe_allow_html=True)
 
-df = load_data(uploaded_file)
+# Hash do arquivo calculado uma única vez por execução; identifica os dados em todos os caches
+file_hash = xxhash.xxh3_64(uploaded_file.getbuffer()).intdigest() if uploaded_file is not None else None
+
+df = load_data(file_hash, uploaded_file)
 
 if df.empty:
     st.info("Por favor, faça upload de um arquivo para começar.")
@@ -331,54 +541,40 @@ if df.empty:
 # CORREÇÃO: Melhorar a sidebar para filtros com tratamento de valores únicos
 st.sidebar.header("🔍 Filtros")
 
-# Filtros dinâmicos baseados nas colunas disponíveis
-available_columns = df.columns.tolist()
+# Filtros dinâmicos baseados nas colunas disponíveis (sem o indicador TemData, derivado em load_data)
+available_columns = [col for col in df.columns if col != "TemData"]
+
+# Colunas do arquivo enviado, incluindo as descartadas em load_data
+uploaded_columns = df.attrs["colunas_arquivo"]
 
-# CORREÇÃO: Filtro por Estado (se disponível) com tratamento de valores únicos
-if "EstadoEntrega" in available_columns:
+# Chave dos filtros aplicados até o momento (arquivo + seleções), usada pelos caches
+filter_key = (file_hash,)
+
+# Máscara única com todos os filtros; o DataFrame é recortado uma só vez ao final
+mascara = np.ones(len(df), dtype=bool)
+
+# CORREÇÃO: Filtros categóricos (apenas os presentes no arquivo) com tratamento de valores únicos
+for col, rotulo, aviso_sem_opcoes in available_filters(available_columns):
     # Remover valores nulos e "Não informado" da lista de opções, mas manter no dataframe
-    estados_unicos = df["EstadoEntrega"].dropna().unique()
-    estados_unicos = [estado for estado in estados_unicos if estado != "Não informado"]
-    estados = ["Todos"] + sorted(estados_unicos)
-    estado_selecionado = st.sidebar.selectbox("Estado:", estados)
-    if estado_selecionado != "Todos":
-        df = df[df["EstadoEntrega"] == estado_selecionado]
-
-# CORREÇÃO: Filtro por Status (se disponível) com tratamento de valores únicos
-if "StatusAtual" in available_columns:
-    status_unicos = df["StatusAtual"].dropna().unique()
-    status_unicos = [status for status in status_unicos if status != "Não informado"]
-    status_options = ["Todos"] + sorted(status_unicos)
-    status_selecionado = st.sidebar.selectbox("Status:", status_options)
-    if status_selecionado != "Todos":
-        df = df[df["StatusAtual"] == status_selecionado]
-
-# CORREÇÃO: Filtro por Tipo de Produto (se disponível) com melhor tratamento
-if "TipoProduto" in available_columns:
-    # Remover valores nulos e "Não informado" da lista de opções
-    tipos_unicos = df["TipoProduto"].dropna().unique()
-    tipos_unicos = [tipo for tipo in tipos_unicos if tipo != "Não informado"]
-    
-    if len(tipos_unicos) > 0:
-        tipos = ["Todos"] + sorted(tipos_unicos)
-        tipo_selecionado = st.sidebar.selectbox("Tipo de Produto:", tipos)
-        if tipo_selecionado != "Todos":
-            df = df[df["TipoProduto"] == tipo_selecionado]
-    else:
-        st.sidebar.info("Nenhum tipo de produto válido encontrado")
+    opcoes = unique_sorted(filter_key, col, df, mascara)
+    if aviso_sem_opcoes and len(opcoes) == 0:
+        st.sidebar.info(aviso_sem_opcoes)
+        continue
+    selecionado = st.sidebar.selectbox(rotulo, ["Todos"] + opcoes)
+    filter_key += (selecionado,)
+    if selecionado != "Todos":
+        mascara &= (df[col] == selecionado).to_numpy()
 
 # Filtro por Período de Pedido (se disponível)
 if "DataPedido" in available_columns:
-    # Garante que a coluna está no formato datetime
-    df["DataPedido"] = pd.to_datetime(df["DataPedido"], errors='coerce')
-    
-    # Filtrar apenas datas válidas para definir o intervalo
-    datas_validas = df["DataPedido"].dropna()
+    # Os dados estão ordenados por DataPedido, com as datas válidas no início
+    n_datas_validas = df["DataPedido"].count()
+    posicoes_validas = np.flatnonzero(mascara[:n_datas_validas])
     
-    if len(datas_validas) > 0:
-        # Define o intervalo de datas com base nos dados disponíveis
-        data_min = datas_validas.min().date()
-        data_max = datas_validas.max().date()
+    if len(posicoes_validas) > 0:
+        # Define o intervalo de datas com base nos dados que passaram pelos filtros anteriores
+        data_min = df["DataPedido"].iloc[posicoes_validas[0]].date()
+        data_max = df["DataPedido"].iloc[posicoes_validas[-1]].date()
 
         # Widget de seleção de intervalo de datas
         data_inicial, data_final = st.sidebar.date_input(
@@ -387,12 +583,24 @@ if "DataPedido" in available_columns:
             min_value=data_min,
             max_value=data_max
         )
-
-        # Aplica o filtro ao DataFrame
-        df = df[(df["DataPedido"].dt.date >= data_inicial) & (df["DataPedido"].dt.date <= data_final)]
+        filter_key += (data_inicial, data_final)
+
+        # O período é um intervalo contíguo: busca binária sobre as datas em int64
+        datas = df["DataPedido"].to_numpy()
+        datas_i8 = datas[:n_datas_validas].view("i8")
+        inicio_i8 = np.datetime64(data_inicial).astype(datas.dtype).astype("int64")
+        fim_i8 = np.datetime64(data_final + timedelta(days=1)).astype(datas.dtype).astype("int64")
+        inicio = np.searchsorted(datas_i8, inicio_i8, side="left")
+        fim = np.searchsorted(datas_i8, fim_i8, side="left")
+        mascara[:inicio] = False
+        mascara[fim:] = False
+
+# Aplica todos os filtros de uma só vez
+if not mascara.all():
+    df = df[mascara]
 
 # Calcular métricas
-metrics = calculate_metrics(df)
+metrics = calculate_metrics(filter_key, df)
 
 # Exibir métricas principais
 col1, col2, col3, col4 = st.columns(4)
@@ -412,19 +620,22 @@ with col4:
 
 st.markdown("---")
 
+# Contagens usadas pelos gráficos, calculadas uma única vez
+contagens = count_values(filter_key, df, COLUNAS_CONTAGEM)
+
 # Gráficos principais
 col1, col2 = st.columns(2)
 
 with col1:
     if "EstadoEntrega" in available_columns:  
-        fig_estados = create_bar_chart(df, "EstadoEntrega", "Top 10 Pedidos por Estados")
+        fig_estados = create_bar_chart(contagens.get("EstadoEntrega"), "EstadoEntrega", "Top 10 Pedidos por Estados")
         st.plotly_chart(fig_estados, use_container_width=True)        
     else:
         st.info("Coluna 'EstadoEntrega' não encontrada nos dados")
 
 with col2:
     if "StatusAtual" in available_columns:
-        fig_status = create_pie_chart(df, "StatusAtual", "Status")
+        fig_status = create_pie_chart(contagens.get("StatusAtual"), "Status")
         st.plotly_chart(fig_status, use_container_width=True)
     else:
         st.info("Coluna 'StatusAtual' não encontrada nos dados")
@@ -441,7 +652,7 @@ with col1:
 
 with col2:
     if "TipoProduto" in available_columns:
-        fig_produtos = create_bar_chart(df, "TipoProduto", "Top 10 Produto por Tipo")
+        fig_produtos = create_bar_chart(contagens.get("TipoProduto"), "TipoProduto", "Top 10 Produto por Tipo")
         st.plotly_chart(fig_produtos, use_container_width=True)
     else:
         st.info("Coluna 'TipoProduto' não encontrada nos dados")
@@ -449,36 +660,31 @@ with col2:
 # Mapa (se dados geográficos disponíveis)
 if "Uf" in available_columns:
     st.markdown("### 🗺️ Distribuição Geográfica")
-    fig_map = create_map(df, "Uf", "Distribuição de Pedidos por Estado")
+    fig_map = create_map(contagens.get("Uf"), "Uf", "Distribuição de Pedidos por Estado")
     st.plotly_chart(fig_map, use_container_width=True)
 
 # Terceira linha de gráficos
 col1, col2 = st.columns(2)
 
 with col1:
-    if "Entregue" in df.columns:
-       df["TemData"] = df["Entregue"].notna() & (df["Entregue"] != "")
-    else:
-       df["TemData"] = False
-
-    if "TemData" in df.columns:
-       contagem = df["TemData"].value_counts().rename({True: "Entregues", False: "Não Entregues"}).reset_index()
+    if "TemData" in contagens:
+       contagem = contagens["TemData"].rename({True: "Entregues", False: "Não Entregues"}).reset_index()
        contagem.columns = ["Status", "Quantidade"]
     
-       fig = px.pie(
-        contagem,
-        names="Status",
-        values="Quantidade",
-        title="Pedidos Entregues e Não Entregues",
-        hole=0.4  # Se quiser estilo "donut", senão remova
-       )
+       fig = go.Figure(go.Pie(
+        labels=contagem["Status"].tolist(),
+        values=contagem["Quantidade"].tolist(),
+        hole=0.4,  # Se quiser estilo "donut", senão remova
+        hovertemplate="Status=%{label}<br>Quantidade=%{value}<extra></extra>"
+       ))
+       fig.update_layout(title="Pedidos Entregues e Não Entregues")
        st.plotly_chart(fig, use_container_width=True)
     else:
        st.info("Coluna 'TemData' não encontrada.")
 
 with col2:
     if "ModeloProduto" in available_columns:
-        fig_modelos = create_bar_chart(df, "ModeloProduto", "Top 10 Produtos por Modelo")
+        fig_modelos = create_bar_chart(contagens.get("ModeloProduto"), "ModeloProduto", "Top 10 Produtos por Modelo")
         st.plotly_chart(fig_modelos, use_container_width=True)
     else:
         st.info("Coluna 'ModeloProduto' não encontrada nos dados")
@@ -500,37 +706,12 @@ else:
 
 # Download dos dados filtrados
 if not df.empty:
-    st.markdown("### 📥 Exportar Dados")
-
-    # Filtrar colunas para exportação
-    df_export = df.copy()
-    cols_to_export = [col for col in COLUNAS_DESEJADAS if col in df_export.columns]
-    df_export = df_export[cols_to_export]
-
-    # Botão de download CSV
-    csv = df_export.to_csv(index=False, sep=";")
-    st.download_button(
-        label="Download CSV",
-        data=csv,
-        file_name=f"acompanhamento_filtrado_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-        mime="text/csv"
-    )
-
-    # Botão de download Excel
-    excel_buffer = io.BytesIO()
-    df_export.to_excel(excel_buffer, index=False, engine="openpyxl")
-    excel_buffer.seek(0)
-    st.download_button(
-        label="Download Excel",
-        data=excel_buffer,
-        file_name=f"acompanhamento_filtrado_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
-        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    )
+    export_section(filter_key, df)
 
 # Informações sobre as colunas disponíveis
 with st.expander("ℹ️ Informações sobre os dados"):
     st.write("**Colunas disponíveis no dataset:**")
-    for col in available_columns:
+    for col in uploaded_columns:
         st.write(f"- {col}")
 
     st.write(f"**Total de registros:** {len(df)}")
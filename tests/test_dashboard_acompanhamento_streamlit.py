@@ -0,0 +1,146 @@
+import io
+import json
+from datetime import date
+from pathlib import Path
+from unittest import mock
+
+import pandas as pd
+from streamlit.runtime.uploaded_file_manager import UploadedFile, UploadedFileRec
+from streamlit.testing.v1 import AppTest
+
+SCRIPT = str(Path(__file__).resolve().parent.parent / "dashboard_acompanhamento_streamlit.py")
+
+CSV = (
+    "NumeroPedido;DataPedido;ModeloProduto;TipoProduto;QuantidadeProduto;OrdemServico;NumeroSerie;"
+    "ApelidoDoEquipamento;StatusAtual;PrevisaoEntrega;Entregue;EstadoEntrega;Uf\n"
+    "1;18/05/2024;M2;Toner;3;OS1;S1;Eq1;Entregue;20/05/2024;19/05/2024;SP;SP\n"
+    "2;04/01/2024;M18;Toner;2;OS2;S2;Eq2;Pendente;10/01/2024;;RJ;RJ\n"
+    "3;15/02/2024;M2;Cilindro;1;OS3;S3;Eq3;Pendente;;;SP;SP\n"
+)
+
+
+def fake_upload(data, name):
+    # O mesmo objeto que o st.file_uploader devolve, sem passar pelo navegador
+    return UploadedFile(UploadedFileRec(file_id=name, name=name, type="", data=data), None)
+
+
+def run_app(data=CSV.encode("cp1252"), name="dados.csv"):
+    with mock.patch("streamlit.file_uploader", return_value=fake_upload(data, name)):
+        return AppTest.from_file(SCRIPT, default_timeout=60).run()
+
+
+def chart_specs(at):
+    return {
+        spec["layout"]["title"]["text"]: spec["data"][0]
+        for spec in (json.loads(chart.proto.spec) for chart in at.get("plotly_chart"))
+    }
+
+
+def test_renders_metrics_without_errors():
+    at = run_app()
+    assert not at.exception
+    metrics = {metric.label: metric.value for metric in at.metric}
+    assert metrics == {
+        "Total de Pedidos": "3",
+        "Pedidos Entregues": "1",
+        "Quantidade Total": "6",
+        "Taxa de Entrega": "33.3%",
+    }
+
+
+def test_loads_excel_with_mixed_number_and_text_models():
+    # Planilhas costumam misturar modelos numéricos e textuais na mesma coluna
+    planilha = pd.read_csv(io.StringIO(CSV), sep=";", dtype=str)
+    planilha["ModeloProduto"] = pd.Series([3200, "M18", "M2"], dtype=object)
+    buffer = io.BytesIO()
+    planilha.to_excel(buffer, index=False)
+    at = run_app(buffer.getvalue(), "dados.xlsx")
+    assert not at.exception
+    assert not at.error
+    metrics = {metric.label: metric.value for metric in at.metric}
+    assert metrics["Total de Pedidos"] == "3"
+
+
+def test_timeline_groups_orders_by_month():
+    at = run_app()
+    assert not at.exception
+    timeline = chart_specs(at)["Evolução Temporal dos Pedidos"]
+    assert timeline["x"] == ["2024-01", "2024-02", "2024-05"]
+
+
+def test_loads_csv_with_short_trailing_rows():
+    # Linhas exportadas de planilhas às vezes omitem as últimas colunas vazias
+    at = run_app((CSV + "4;20/02/2024;M2;Toner;1\n").encode("utf-8"))
+    assert not at.exception
+    assert not at.error
+    metrics = {metric.label: metric.value for metric in at.metric}
+    assert metrics["Total de Pedidos"] == "4"
+
+
+def test_period_filter_keeps_whole_final_day():
+    csv = "\n".join(
+        [CSV.splitlines()[0]]
+        + [
+            "1;18/05/2024 08:00;M2;Toner;3;OS1;S1;Eq1;Entregue;20/05/2024;19/05/2024;SP;SP",
+            "2;04/01/2024 09:00;M18;Toner;2;OS2;S2;Eq2;Pendente;10/01/2024;;RJ;RJ",
+            "3;15/02/2024 10:00;M2;Cilindro;1;OS3;S3;Eq3;Pendente;;;SP;SP",
+            # Pedido feito no fim do último dia do período
+            "4;20/02/2024 23:30;M2;Toner;4;OS4;S4;Eq4;Entregue;22/02/2024;21/02/2024;SP;SP",
+            # Data inválida: fica fora de qualquer período
+            "5;sem data;M2;Toner;5;OS5;S5;Eq5;Pendente;;;SP;SP",
+        ]
+    ) + "\n"
+    with mock.patch("streamlit.file_uploader", return_value=fake_upload(csv.encode("utf-8"), "dados.csv")):
+        at = AppTest.from_file(SCRIPT, default_timeout=60).run()
+        at.sidebar.date_input[0].set_value((date(2024, 2, 1), date(2024, 2, 20))).run()
+    assert not at.exception
+    metrics = {metric.label: metric.value for metric in at.metric}
+    assert metrics == {
+        "Total de Pedidos": "2",
+        "Pedidos Entregues": "1",
+        "Quantidade Total": "5",
+        "Taxa de Entrega": "50.0%",
+    }
+
+
+def test_csv_export_matches_pandas_to_csv():
+    # DataPedido só com datas, PrevisaoEntrega com horários e Entregue com fração de segundo,
+    # além das colunas categóricas e de texto
+    csv = "\n".join(
+        [CSV.splitlines()[0]]
+        + [
+            "1;18/05/2024;3200;Toner;3;OS1;S1;Eq1;Entregue;20/05/2024 14:00;19/05/2024 10:30:00.500;SP;SP",
+            "2;04/01/2024;M18;Toner;2;OS2;S2;Eq2;Pendente;10/01/2024 09:00;;RJ;RJ",
+            "3;15/02/2024;M2;Cilindro;1;OS3;;Eq3;Pendente;;;SP;SP",
+        ]
+    ) + "\n"
+    with (
+        mock.patch("streamlit.file_uploader", return_value=fake_upload(csv.encode("utf-8"), "dados.csv")),
+        mock.patch("streamlit.dataframe") as dataframe,
+        mock.patch("streamlit.download_button") as download_button,
+    ):
+        at = AppTest.from_file(SCRIPT, default_timeout=60).run()
+    assert not at.exception
+    exportado = dataframe.call_args.args[0]
+    downloads = {call.kwargs["label"]: call.kwargs["data"] for call in download_button.call_args_list}
+    assert downloads["Download CSV"].decode("utf-8") == exportado.to_csv(index=False, sep=";")
+    assert "2024-05-19 10:30:00.500" in downloads["Download CSV"].decode("utf-8")
+
+
+def test_info_expander_lists_only_uploaded_columns():
+    # "Municipio" não é usada pelo dashboard e é descartada em load_data
+    lines = CSV.splitlines()
+    csv = "\n".join([lines[0] + ";Municipio"] + [line + ";Campinas" for line in lines[1:]]) + "\n"
+    at = run_app(csv.encode("utf-8"))
+    listed = [md.value for md in at.expander[0].markdown if md.value.startswith("- ")]
+    assert "- TemData" not in listed
+    assert "- NumeroPedido" in listed
+    assert "- Municipio" in listed
+
+
+def test_pie_hover_matches_previous_labels():
+    specs = chart_specs(run_app())
+    assert specs["Pedidos Entregues e Não Entregues"]["hovertemplate"] == (
+        "Status=%{label}<br>Quantidade=%{value}<extra></extra>"
+    )
+    assert specs["Status"]["hovertemplate"] == "label=%{label}<br>value=%{value}<extra></extra>"